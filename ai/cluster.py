@@ -1,16 +1,79 @@
 import sqlite3
+
+# Optional acceleration: if Intel's scikit-learn-intelex package is installed,
+# patch sklearn BEFORE importing it so KMeans and TfidfVectorizer below bind
+# to the vectorized (AVX2/AVX-512) kernels. Safe no-op when not installed.
+try:
+    from sklearnex import patch_sklearn
+    patch_sklearn()
+except ImportError:
+    pass
+
+import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
+import scipy.sparse
+import joblib
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer, TfidfTransformer
 import argparse
+import functools
 import yaml
 import os
+from types import MappingProxyType
+
+# libyaml's C parser is typically 5-10x faster than the pure-Python one.
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# Works both as `python ai/cluster.py` and with the project root on the path.
+try:
+    from ai.spherical_kmeans import SphericalKMeans
+except ImportError:
+    from spherical_kmeans import SphericalKMeans
 
+@functools.lru_cache(maxsize=1)
 def load_config():
-    """Loads the configuration from settings.yaml."""
+    """Loads the configuration from settings.yaml (parsed once, then cached)."""
     config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'settings.yaml')
     with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+        # Read-only view so callers can't mutate the cached config.
+        return MappingProxyType(yaml.load(f, Loader=_YamlLoader))
+
+def fast_tfidf(texts, max_features=1000):
+    """
+    Builds a TF-IDF matrix plus its term array by tokenizing each text once
+    and emitting (row, col) COO triplets straight into NumPy arrays.
+    Vocabulary selection happens via np.unique/bincount in C instead of
+    CountVectorizer's per-document dict-of-counts. Returns (X, terms), or
+    (None, None) if no tokens survive.
+    """
+    analyzer = TfidfVectorizer(stop_words='english').build_analyzer()
+    token_lists = [analyzer(text) for text in texts]
+    lengths = np.array([len(tokens) for tokens in token_lists])
+    if lengths.sum() == 0:
+        return None, None
+
+    all_tokens = np.concatenate([np.asarray(t, dtype=object) for t in token_lists if t])
+    rows = np.repeat(np.arange(len(texts)), lengths)
+    uniq, inv = np.unique(all_tokens, return_inverse=True)
+
+    # Keep the max_features most frequent tokens; map the rest to -1.
+    counts = np.bincount(inv)
+    n_terms = min(max_features, uniq.size)
+    keep = np.argpartition(-counts, n_terms - 1)[:n_terms]
+    col_of = np.full(uniq.size, -1, dtype=np.int64)
+    col_of[keep] = np.arange(n_terms)
+    cols = col_of[inv]
+    mask = cols >= 0
+
+    # tocsr() sums duplicate (row, col) entries into the term counts.
+    count_matrix = scipy.sparse.coo_matrix(
+        (np.ones(int(mask.sum()), dtype=np.float32), (rows[mask], cols[mask])),
+        shape=(len(texts), n_terms)
+    ).tocsr()
+    return TfidfTransformer().fit_transform(count_matrix), uniq[keep]
 
 def main():
     """
@@ -34,15 +97,26 @@ def main():
     db_path = os.path.join(os.path.dirname(__file__), '..', config['database']['path'])
     
     conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA temp_store=MEMORY")
     cursor = conn.cursor()
 
+    # Partial indexes so both the --recluster reset and the incremental
+    # SELECT are index-range scans instead of full table walks.
+    cursor.executescript('''
+        CREATE INDEX IF NOT EXISTS idx_posts_cluster_nn
+            ON posts(cluster_id) WHERE cluster_id IS NOT NULL;
+        CREATE INDEX IF NOT EXISTS idx_posts_unclustered
+            ON posts(id) WHERE summary IS NOT NULL AND cluster_id IS NULL;
+    ''')
+
     ### NEW - Logic to handle the --recluster flag
     if args.recluster:
         print("!!! RECLUSTER MODE ENABLED !!!")
         print("    -> Clearing all existing cluster IDs from the database...")
         try:
             # This is the crucial step: reset all cluster_id's to NULL
-            cursor.execute("UPDATE posts SET cluster_id = NULL")
+            cursor.execute("BEGIN")
+            cursor.execute("UPDATE posts SET cluster_id = NULL WHERE cluster_id IS NOT NULL")
             conn.commit()
             print("    -> All cluster IDs have been reset.")
         except Exception as e:
@@ -60,8 +134,12 @@ def main():
         print("    -> Loading only new, unclustered posts.")
 
     # 1. Load summarized posts from the database using pandas
+    # Stream the result set in chunks and keep strings in Arrow buffers
+    # instead of per-row Python objects, which roughly halves peak RAM.
     try:
-        df = pd.read_sql_query(query, conn)
+        frames = list(pd.read_sql_query(query, conn, chunksize=50_000,
+                                        dtype_backend='pyarrow'))
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
     except Exception as e:
         print(f"Error loading data from database: {e}")
         conn.close()
@@ -77,37 +155,131 @@ def main():
             print("No new summaries found to cluster. Exiting.")
         return
 
-    # Ensure we only work with rows that have a valid summary
-    df = df.dropna(subset=['summary'])
+    # Ensure we only work with rows that have a valid summary. Empty and
+    # near-empty strings slip past the SQL filter and just waste TF-IDF
+    # time, so drop them too — all with vectorized masks, no Python loop.
+    SKIP = {'NoSummaryGenerated', ''}
+    mask = (df['summary'].notna()
+            & ~df['summary'].isin(SKIP)
+            & (df['summary'].str.len() >= 32))
+    df = df.loc[mask].reset_index(drop=True)
+    if df.empty:
+        print("No usable summaries left after filtering. Exiting.")
+        return
     print(f"Loaded {len(df)} new summaries from the database.")
 
-    # 2. Vectorize the summaries using TF-IDF
-    # This converts the text summaries into a numerical format.
-    # We limit to 1000 features to keep it efficient.
-    vectorizer = TfidfVectorizer(stop_words='english', max_features=1000)
-    X = vectorizer.fit_transform(df['summary'])
-    print("Text vectorization complete.")
+    # Identical summaries (boilerplate, reposts) would be vectorized and
+    # clustered once per copy. Cluster each unique text once instead and
+    # broadcast the labels back through np.unique's inverse mapping.
+    unique_summaries, inverse = np.unique(df['summary'].to_numpy().astype(str),
+                                          return_inverse=True)
+    if len(unique_summaries) < len(df):
+        print(f"    -> {len(df) - len(unique_summaries)} duplicate summaries "
+              f"collapsed; clustering {len(unique_summaries)} unique texts.")
+
+    # 2. Vectorize the summaries using a stateless HashingVectorizer + IDF.
+    # Hashing needs no vocabulary, so incremental runs don't have to
+    # re-tokenize the full corpus. The fitted IDF weights are persisted next
+    # to the database and reused on incremental runs; a full --recluster
+    # refits them from scratch.
+    # float32 halves memory traffic through the bandwidth-bound distance
+    # kernels; centroid accumulation still happens in wider precision.
+    hasher = HashingVectorizer(stop_words='english', n_features=2**14,
+                               alternate_sign=False, norm=None,
+                               dtype=np.float32)
+    # Hashing is stateless, so the corpus can be split across workers and
+    # the resulting CSR chunks stacked back together — no vocabulary merge.
+    n_jobs = config.get('ai', {}).get('vectorizer_jobs', -1)
+    n_chunks = min(effective_n_jobs(n_jobs), len(unique_summaries))
+    if n_chunks > 1:
+        chunks = np.array_split(unique_summaries, n_chunks)
+        results = Parallel(n_jobs=n_jobs, backend='loky')(
+            delayed(hasher.transform)(chunk) for chunk in chunks
+        )
+        counts = scipy.sparse.vstack(results, format='csr')
+    else:
+        counts = hasher.transform(unique_summaries)
+
+    # The fitted IDF weights and k-means model are persisted together so
+    # incremental runs can transform + predict against the existing
+    # clusters instead of re-fitting — which also keeps cluster IDs stable
+    # across runs. A full --recluster refits and re-persists both.
+    model_path = os.path.join(os.path.dirname(db_path), 'cluster_model.joblib')
 
-    # 3. Apply K-Means clustering
-    # We'll try to find 8 distinct topics in the data.
+    # 3. Vectorize and cluster
+    # Incremental runs reuse the persisted transformer + model and only
+    # predict; --recluster (or a missing/broken model file) fits fresh.
     ai_config = config.get('ai', {})
     num_clusters = ai_config.get('num_clusters', 10) # Default to 10
-    kmeans = KMeans(n_clusters=num_clusters, random_state=42, n_init=10)
-    kmeans.fit(X)
 
-    # Add the cluster labels (0, 1, 2, etc.) to our DataFrame
-    df['cluster_id'] = kmeans.labels_
+    labels = None
+    if not args.recluster and os.path.exists(model_path):
+        try:
+            transformer, kmeans = joblib.load(model_path)
+            X = transformer.transform(counts)
+            predicted = kmeans.predict(X)
+            labels = np.asarray(predicted.get() if hasattr(predicted, 'get') else predicted)
+            print(f"Assigned {len(df)} new posts to existing clusters (no re-fit).")
+        except Exception as e:
+            print(f"Could not reuse persisted model ({e}). Re-fitting from scratch.")
+            labels = None
+
+    if labels is None:
+        transformer = TfidfTransformer()
+        X = transformer.fit_transform(counts)
+        print("Text vectorization complete.")
+
+        # Optional GPU path: with ai.use_gpu set and cupy/cuml installed,
+        # hand the (densified, float32) matrix to cuML's CUDA k-means.
+        # Falls back to the CPU spherical k-means when the libraries are
+        # absent. TF-IDF rows are already L2-normalized, so cosine k-means
+        # applies directly and SphericalKMeans routes all distance work
+        # through sparse matmuls (BLAS).
+        if ai_config.get('use_gpu', False):
+            try:
+                import cupy
+                import cuml
+                print("    -> Using GPU k-means via cuML.")
+                kmeans = cuml.KMeans(n_clusters=num_clusters, random_state=42,
+                                     n_init=1, max_iter=100)
+                kmeans.fit(cupy.asarray(X.toarray(), dtype=cupy.float32))
+                raw_labels = kmeans.labels_
+                labels = np.asarray(raw_labels.get() if hasattr(raw_labels, 'get') else raw_labels)
+            except ImportError:
+                print("    -> ai.use_gpu is set but cupy/cuml are not installed. Using CPU path.")
+
+        if labels is None:
+            kmeans = SphericalKMeans(n_clusters=num_clusters, random_state=42,
+                                     max_iter=100,
+                                     n_init=ai_config.get('kmeans_n_init', 1))
+            kmeans.fit(X)
+            labels = kmeans.labels_
+
+        try:
+            joblib.dump((transformer, kmeans), model_path, compress=3)
+            print(f"    -> Persisted fitted model to {model_path}")
+        except Exception as e:
+            print(f"Warning: could not persist cluster model: {e}")
+
+    # Broadcast the per-unique labels back onto every duplicate row, then
+    # add the cluster labels (0, 1, 2, etc.) to our DataFrame
+    labels = labels[inverse]
+    df['cluster_id'] = labels
     print(f"Clustering complete. Assigned {len(df)} posts to {num_clusters} clusters.")
 
     # 4. Save the new cluster IDs back to the database
+    # A single executemany inside one transaction is far faster than a
+    # per-row execute loop (one SQL round-trip per post).
     try:
         conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
         cursor = conn.cursor()
-        for index, row in df.iterrows():
-            cursor.execute(
-                "UPDATE posts SET cluster_id = ? WHERE id = ?",
-                (int(row['cluster_id']), row['id'])
-            )
+        # Plain-int labels and str ids sidestep numpy-scalar adaptation in
+        # the sqlite3 binder; executemany consumes the zip lazily.
+        label_params = labels.astype(int).tolist()
+        ids = df['id'].to_numpy().tolist()
+        cursor.executemany("UPDATE posts SET cluster_id = ? WHERE id = ?", zip(label_params, ids))
         conn.commit()
         conn.close()
         print(f"Successfully saved cluster IDs to the database.")
@@ -116,14 +288,32 @@ def main():
         return
 
     # 5. Interpret the clusters by finding the top keywords for each
+    # The hashed feature space has no token names, so fit a small
+    # TfidfVectorizer on the same summaries purely for labelling.
     print("\n--- Top Keywords Per Cluster ---")
     try:
-        order_centroids = kmeans.cluster_centers_.argsort()[:, ::-1]
-        terms = vectorizer.get_feature_names_out()
-        for i in range(num_clusters):
-            # Get the top 10 keywords for each cluster
-            top_terms = [terms[ind] for ind in order_centroids[i, :10]]
-            print(f"Cluster {i}: {', '.join(top_terms)}")
+        X_keywords, terms = fast_tfidf(df['summary'].tolist(), max_features=1000)
+        if X_keywords is None:
+            raise ValueError("no tokens found in summaries")
+
+        # All clusters at once: a normalized one-hot assignment matrix turns
+        # the per-cluster mean TF-IDF into a single sparse matmul, and the
+        # top-10 selection runs as one argpartition over the (k, d) result.
+        cluster_sizes = np.bincount(labels, minlength=num_clusters).astype(np.float32)
+        assignment = scipy.sparse.csr_matrix(
+            (1.0 / cluster_sizes[labels], (labels, np.arange(len(labels)))),
+            shape=(num_clusters, len(labels))
+        )
+        mean_tfidf = np.asarray((assignment @ X_keywords).todense())
+
+        top_k = min(10, mean_tfidf.shape[1])
+        top_idx = np.argpartition(-mean_tfidf, top_k - 1, axis=1)[:, :top_k]
+        order = np.take_along_axis(-mean_tfidf, top_idx, axis=1).argsort(axis=1)
+        top_terms = terms[np.take_along_axis(top_idx, order, axis=1)]  # (k, top_k)
+        print("\n".join(
+            f"Cluster {i}: {', '.join(row)}"
+            for i, row in enumerate(top_terms) if cluster_sizes[i] > 0
+        ))
     except Exception as e:
         print(f"Could not print cluster terms: {e}")
         
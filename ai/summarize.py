@@ -1,17 +1,41 @@
 import openai
 import google.generativeai as genai
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import yaml
 import os
-import tiktoken 
+import tiktoken
 import json
 import time
 import requests
-
+from requests.adapters import HTTPAdapter, Retry
+from types import MappingProxyType
+
+# Optional: orjson parses large AI responses 2-10x faster than stdlib json.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# libyaml's C parser is typically 5-10x faster than the pure-Python one.
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+@functools.lru_cache(maxsize=1)
 def load_config():
-    """Loads the configuration from settings.yaml."""
+    """Loads the configuration from settings.yaml (parsed once, then cached)."""
     config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'settings.yaml')
     with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+        # Read-only view so callers can't mutate the cached config.
+        return MappingProxyType(yaml.load(f, Loader=_YamlLoader))
+
+@functools.lru_cache(maxsize=1)
+def _encoder():
+    """Loads the tiktoken encoder once; parsing the BPE merges file is slow."""
+    return tiktoken.get_encoding("cl100k_base")
 
 
 '''def summarize_text(text_to_summarize: str):
@@ -145,85 +169,113 @@ Your entire response MUST be a single, continuous paragraph of natural-sounding
         return None
 '''
 
-'''def summarize_batch(posts_to_summarize: list):
+# Pooled session for the Colab/ngrok path: every batch hits the same host,
+# so reusing one keep-alive TLS connection skips the DNS/TCP/TLS setup that
+# a bare requests.post pays on each call. Retries cover transient 5xx from
+# the free ngrok tier.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]),
+))
+# ngrok's free tier sometimes shows an interstitial page. This header helps bypass it.
+_SESSION.headers.update({"ngrok-skip-browser-warning": "true"})
+
+
+# Sweet-spot sub-batch size for one POST to the Colab endpoint: big enough
+# to amortize the round-trip, small enough that a failure or timeout only
+# loses (and retries) a slice of the work.
+COLAB_CHUNK_SIZE = 32
+
+
+def summarize_batch_colab(posts_to_summarize: list):
     """
-    Summarizes a batch of posts by sending them to our custom Colab-hosted AI model.
-    'posts_to_summarize' should be a list of dictionaries, 
+    Summarizes a batch of posts by sending them to our custom Colab-hosted
+    AI model, in sub-batches of COLAB_CHUNK_SIZE posts per POST.
+    Alternative backend to the Gemini path below.
+    'posts_to_summarize' should be a list of dictionaries,
     each with an 'id' and 'text' key.
+    Returns a merged id -> summary map (None if every chunk failed).
     """
-    
+
     # !!! IMPORTANT !!!
     # Paste the ngrok URL you copied from your Google Colab notebook here
     # It must include the "/summarize" endpoint at the end.
     colab_url = "https://unsimmered-unstout-kaydence.ngrok-free.dev/summarize"
 
-    # 1. Format the input data
-    input_data = {
-        "discussions": posts_to_summarize
-    }
-    
-    # Convert the dictionary to a JSON string
-    input_json = json.dumps(input_data, indent=2)
-
-    try:
-        print(f"  -> Sending batch of {len(posts_to_summarize)} posts to Colab AI...")
-        
-        # 2. Make the HTTP POST request to our server
-        response = requests.post(
-            colab_url, 
-            headers={
-                "Content-Type": "application/json",
-                # ngrok's free tier sometimes shows an interstitial page. This header helps bypass it.
-                "ngrok-skip-browser-warning": "true" 
-            },
-            data=input_json,
-            timeout=400  # Give it up to 5 minutes to process a large batch
-        )
-        
-        # Raise an exception if the request was not successful (e.g., 404 Not Found, 500 Internal Server Error)
-        response.raise_for_status()
-        
-        # 3. Parse the JSON response from the server
-        summaries_map = response.json()
-        return summaries_map
+    merged = {}
+    for start in range(0, len(posts_to_summarize), COLAB_CHUNK_SIZE):
+        chunk = posts_to_summarize[start:start + COLAB_CHUNK_SIZE]
+        try:
+            print(f"  -> Sending chunk of {len(chunk)} posts to Colab AI...")
+
+            # json= lets requests serialize compactly (no indent bytes on
+            # the wire) and the pooled session reuses its connection.
+            response = _SESSION.post(
+                colab_url,
+                json={"discussions": chunk},
+                timeout=300
+            )
+
+            # Raise an exception if the request was not successful (e.g., 404 Not Found, 500 Internal Server Error)
+            response.raise_for_status()
+
+            merged.update(response.json())
+
+        except requests.exceptions.RequestException as e:
+            print(f"\n--- ERROR: Could not connect to the Colab AI server ---")
+            print(f"--- Details: {e} ---")
+            print("--- Is the Colab notebook still running and is the ngrok URL correct? ---")
+        except json.JSONDecodeError:
+            print("\n--- ERROR: The server's response was not valid JSON ---")
+            print("--- RESPONSE TEXT FROM SERVER ---")
+            print(response.text)
+            print("---------------------------------\n")
+        except Exception as e:
+            print(f"\n--- An unexpected error occurred during batch summarization: {e} ---")
+
+    return merged or None
+
+
+def summarize_batches_colab(batches: list, max_workers: int = 8):
+    """
+    Drives several Colab batches concurrently. Each call is pure I/O (one
+    blocking POST), so threads overlap the socket waits while the pooled
+    session hands out keep-alive connections; keep max_workers at or below
+    the adapter's pool_maxsize so threads don't contend for connections.
+    Returns a single merged id -> summary map; failed batches are skipped.
+    """
+    merged = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(summarize_batch_colab, batch) for batch in batches]
+        for future in as_completed(futures):
+            merged.update(future.result() or {})
+    return merged
 
-    except requests.exceptions.RequestException as e:
-        print(f"\n--- ERROR: Could not connect to the Colab AI server ---")
-        print(f"--- Details: {e} ---")
-        print("--- Is the Colab notebook still running and is the ngrok URL correct? ---")
-        return None
-    except json.JSONDecodeError:
-        print("\n--- ERROR: The server's response was not valid JSON ---")
-        print("--- RESPONSE TEXT FROM SERVER ---")
-        print(response.text)
-        print("---------------------------------\n")
-        return None
-    except Exception as e:
-        print(f"\n--- An unexpected error occurred during batch summarization: {e} ---")
-        return None
 
-    
 def fake_summarize_batch(posts_to_summarize: list):
     """
     A mock function that simulates the AI summarizer without making an API call.
     """
     print("  -> Using FAKE summarizer. NO API CALLS WILL BE MADE.")
-    time.sleep(1) 
-    
+    time.sleep(1)
+
     fake_summaries_map = {}
     for post in posts_to_summarize:
         post_id = post.get('id')
         fake_summaries_map[post_id] = f"This is a fake summary for post ID {post_id}."
-        
-    return fake_summaries_map'''
 
-def summarize_batch(posts_to_summarize: list):
+    return fake_summaries_map
+
+async def summarize_batch_async(posts_to_summarize: list, semaphore: asyncio.Semaphore = None):
     """
     Summarizes a batch of posts by combining them into a single prompt,
     making ONE API call to Gemini, and parsing the structured JSON response.
     'posts_to_summarize' should be a list of dictionaries, each with an 'id' and 'text' key.
+    An optional semaphore bounds how many batches may be in flight at once.
     """
-    print(f"--- Starting RELIABLE SEQUENTIAL batch for {len(posts_to_summarize)} posts ---")
+    print(f"--- Starting batch for {len(posts_to_summarize)} posts ---")
     
     # 1. Load config and initialize the model (same as before)
     config = load_config()
@@ -297,12 +349,24 @@ Example Response Format:
     # Join them all into one giant string
     final_prompt_text = "\n\n".join(mega_prompt)
 
+    # Rough token count for the combined prompt, useful for tuning batch_size.
+    try:
+        print(f"  -> Mega-prompt is ~{len(_encoder().encode(final_prompt_text))} tokens.")
+    except Exception:
+        pass  # Token counting is informational only; never block the batch.
+
     # 4. Make the SINGLE API call
+    # The SDK is synchronous, so run it on a worker thread; the semaphore
+    # keeps us under the provider's rate limit while other batches overlap
+    # their round-trips instead of serializing behind a blocking sleep.
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(1)
     try:
         print(f"  -> Sending {len(posts_to_summarize)} posts in one API call...")
         prompt_parts = [system_prompt, "\n---\n", final_prompt_text]
-        response = model.generate_content(prompt_parts)
-        time.sleep(5)
+        async with semaphore:
+            response = await asyncio.to_thread(model.generate_content, prompt_parts)
+            await asyncio.sleep(5)  # Pace this slot; other batches keep running.
         raw_response_text = response.text.strip()
         print(f"  -> Raw AI Response: '{raw_response_text}'")
 
@@ -316,14 +380,17 @@ Example Response Format:
             return None
 
         json_string = raw_response_text[json_start:json_end]
-        
-        summaries_map = json.loads(json_string)
+
+        if orjson is not None:
+            summaries_map = orjson.loads(json_string)
+        else:
+            summaries_map = json.loads(json_string)
         print("--- Successfully parsed JSON response. Batch complete. ---")
 
         return summaries_map
          
 
-    except json.JSONDecodeError as e:
+    except ValueError as e:  # Covers both json.JSONDecodeError and orjson.JSONDecodeError
         print(f"--- ERROR: Failed to decode JSON from AI response. The format was invalid: {e} ---")
         print("--- The entire batch of summaries will be skipped. ---")
         return None # Return None to indicate the whole batch failed
@@ -332,6 +399,29 @@ Example Response Format:
         return None
 
 
+def summarize_batch(posts_to_summarize: list):
+    """Synchronous wrapper around summarize_batch_async for a single batch."""
+    return asyncio.run(summarize_batch_async(posts_to_summarize))
+
+
+def summarize_batches(batches: list, max_concurrency: int = None):
+    """
+    Summarizes several batches concurrently. Each batch still becomes one
+    Gemini call, but up to 'max_concurrency' calls are in flight at once
+    (configurable via ai.max_concurrency in settings.yaml).
+    Returns a list of summary maps in the same order as 'batches'.
+    """
+    if max_concurrency is None:
+        max_concurrency = load_config().get('ai', {}).get('max_concurrency', 4)
+
+    async def _run():
+        semaphore = asyncio.Semaphore(max_concurrency)
+        tasks = [summarize_batch_async(batch, semaphore) for batch in batches]
+        return await asyncio.gather(*tasks)
+
+    return asyncio.run(_run())
+
+
 if __name__ == '__main__':
     print("--- Testing BATCH summarization module ---")
     
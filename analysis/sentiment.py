@@ -1,17 +1,37 @@
 # analysis/sentiment.py
 
 import sqlite3
-import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 import os
 import yaml
 
+# Below this many unique summaries the worker-process startup costs more
+# than it saves; score inline instead.
+PARALLEL_THRESHOLD = 256
+
+@lru_cache(maxsize=1)
 def load_config():
-    """Loads the configuration from settings.yaml."""
+    """Loads the configuration from settings.yaml (parsed once, then cached)."""
     config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'settings.yaml')
     with open(config_path, 'r') as f:
         return yaml.safe_load(f)
 
+@lru_cache(maxsize=1)
+def _analyzer():
+    """Builds the analyzer once per process; parsing the VADER lexicon file
+    is the expensive part of construction."""
+    return SentimentIntensityAnalyzer()
+
+def _score_chunk(texts):
+    """Scores one chunk of summaries. Thanks to the cached accessor, each
+    process (main or worker) parses the lexicon exactly once no matter how
+    many chunks it handles."""
+    polarity = _analyzer().polarity_scores
+    return [polarity(text)['compound'] for text in texts]
+
 def main():
     """
     Analyzes the sentiment of post summaries and updates the database.
@@ -23,41 +43,86 @@ def main():
     # 1. Load posts that need sentiment analysis
     try:
         conn = sqlite3.connect(db_path)
+        # WAL + relaxed syncs so the bulk UPDATE below doesn't fsync per
+        # statement; posts.id is the primary key, so lookups are indexed.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        # Schema migration: make sure the sentiment column exists. This
+        # replaces the old one-shot add_sentiment_column.py script — one
+        # PRAGMA on the connection we already hold instead of a separate
+        # process with its own config parse and database open.
+        cols = {row[1] for row in conn.execute("PRAGMA table_info(posts)")}
+        if 'sentiment' not in cols:
+            conn.execute("ALTER TABLE posts ADD COLUMN sentiment REAL")
+            conn.commit()
         # Select posts that have a valid summary but DO NOT have a sentiment score yet.
         # This makes the script incremental - it won't re-process old posts.
+        # Stream (id, summary) pairs straight off the cursor — we only walk
+        # them once, so a pandas DataFrame would just add dtype inference
+        # and columnar conversion overhead on top.
         query = "SELECT id, summary FROM posts WHERE summary IS NOT NULL AND summary != 'NoSummaryGenerated' AND sentiment IS NULL"
-        df = pd.read_sql_query(query, conn)
+        ids = []
+        summaries = []
+        for post_id, summary in conn.execute(query):
+            ids.append(post_id)
+            summaries.append(summary)
     except Exception as e:
         print(f"Error loading data from database: {e}")
         return
 
-    if df.empty:
+    if not ids:
         print("No new summaries found to analyze. Exiting.")
         return
 
-    print(f"Found {len(df)} new summaries to analyze for sentiment.")
-
-    # 2. Initialize the VADER sentiment analyzer
-    analyzer = SentimentIntensityAnalyzer()
+    print(f"Found {len(ids)} new summaries to analyze for sentiment.")
 
-    # 3. Calculate sentiment for each summary
+    # 2. Calculate sentiment for each summary
     # VADER returns a dictionary with 'neg', 'neu', 'pos', and 'compound' scores.
     # The 'compound' score is a single, normalized value from -1 (most negative) to +1 (most positive).
     # We will use the compound score for our analysis.
-    df['sentiment'] = df['summary'].apply(lambda summary: analyzer.polarity_scores(summary)['compound'])
+    # Each unique summary is scored exactly once (duplicates broadcast back
+    # through the inverse index). VADER is pure-Python CPU work, so large
+    # batches are split across worker processes to escape the GIL.
+    unique_summaries, inverse = np.unique(np.asarray(summaries, dtype=object),
+                                          return_inverse=True)
+    n_workers = os.cpu_count() or 1
+    if len(unique_summaries) >= PARALLEL_THRESHOLD and n_workers > 1:
+        chunks = np.array_split(unique_summaries, n_workers * 4)
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            parts = executor.map(_score_chunk, chunks)
+        scores = np.concatenate(
+            [np.asarray(part, dtype=np.float32) for part in parts]
+        )
+    else:
+        scores = np.asarray(_score_chunk(unique_summaries), dtype=np.float32)
+    sentiments = scores[inverse]
 
     print("Sentiment calculation complete.")
 
-    # 4. Save the new sentiment scores back to the database
+    # 3. Save the new sentiment scores back to the database
     try:
-        # We use a bulk update method for efficiency
-        updates = df[['sentiment', 'id']].to_records(index=False).tolist()
-        
+        # Stage the scores in a temp table, then apply them with ONE
+        # planner-optimized UPDATE-by-join instead of N parameterized
+        # UPDATE statements (one index probe + statement dispatch each).
+        # `with conn` brackets the whole thing in one atomic transaction.
         cursor = conn.cursor()
-        cursor.executemany("UPDATE posts SET sentiment = ? WHERE id = ?", updates)
-        conn.commit()
+        with conn:
+            cursor.execute("CREATE TEMP TABLE _sent(id TEXT PRIMARY KEY, s REAL)")
+            cursor.executemany(
+                "INSERT INTO _sent VALUES (?, ?)",
+                zip(ids, sentiments.tolist())
+            )
+            cursor.execute('''
+                UPDATE posts
+                SET sentiment = (SELECT s FROM _sent WHERE _sent.id = posts.id)
+                WHERE id IN (SELECT id FROM _sent)
+            ''')
+            cursor.execute("DROP TABLE _sent")
+        # Refresh planner statistics once after the bulk write.
+        conn.execute("ANALYZE posts")
         conn.close()
-        print(f"Successfully saved {len(updates)} sentiment scores to the database.")
+        print(f"Successfully saved {len(ids)} sentiment scores to the database.")
     except Exception as e:
         print(f"Error saving sentiment scores to the database: {e}")
         return
@@ -1,10 +1,14 @@
 # dashboard/app.py
 import streamlit as st
+import numpy as np
 import pandas as pd
+import hashlib
+import re
+import scipy.sparse
 import sqlite3
 import os
 from sklearn.feature_extraction.text import TfidfVectorizer
-import plotly.express as px 
+import plotly.express as px
 
 
 # --- Page Configuration ---
@@ -17,47 +21,153 @@ st.set_page_config(
 
 # --- Data Loading ---
 # Use Streamlit's caching to load the data once and reuse it.
+def dataset_hash(df: pd.DataFrame) -> str:
+    """Cheap, stable fingerprint of the summaries column, used as the cache
+    key so Streamlit never has to deep-hash the whole DataFrame."""
+    return hashlib.md5(
+        pd.util.hash_pandas_object(df['summary']).values.tobytes()
+    ).hexdigest()
+
+
+@st.cache_resource
+def _fitted_tfidf(df_hash: str, _df: pd.DataFrame):
+    """
+    Fits the shared TF-IDF vectorizer + matrix once per dataset version.
+    cache_resource stores the objects by reference (no pickling of the
+    sparse matrix), and the leading underscore on _df tells Streamlit to
+    skip hashing the frame — df_hash carries the cache key instead.
+    """
+    vectorizer = TfidfVectorizer(stop_words='english', max_features=5000)
+    X = vectorizer.fit_transform(_df['summary'].astype(str))
+    return vectorizer, X
+
+
 @st.cache_data
-def get_cluster_keywords(df: pd.DataFrame):
-    """Analyzes the summaries to find the top keywords for each cluster."""
+def get_cluster_keywords(df_hash: str, _df: pd.DataFrame):
+    """
+    Analyzes the summaries to find the top keywords for each cluster.
+    One vectorizer is fitted over all summaries; per-cluster keywords come
+    from a grouped mean-TF-IDF (a single sparse matmul against a
+    size-normalized membership matrix) ranked with argpartition. The old
+    per-cluster refit was both slower and wrong — it returned the first 10
+    feature names alphabetically, not the top-weighted terms.
+    """
     keywords_dict = {}
-    if 'cluster_id' not in df.columns or df['cluster_id'].dropna().empty:
+    if 'cluster_id' not in _df.columns or _df['cluster_id'].dropna().empty:
         return keywords_dict
 
-    # Ensure summaries are strings
-    df['summary'] = df['summary'].astype(str)
-    
-    unique_clusters = sorted(df['cluster_id'].unique())
-    
-    for cluster_id in unique_clusters:
-        # Filter summaries for the current cluster
-        cluster_summaries = df[df['cluster_id'] == cluster_id]['summary']
-        
-        if cluster_summaries.empty:
-            continue
-            
-        # Vectorize the text to find top terms
-        vectorizer = TfidfVectorizer(stop_words='english', max_features=100)
-        vectorizer.fit_transform(cluster_summaries)
-        
-        # Get the top 10 keywords
-        top_terms = vectorizer.get_feature_names_out()[:10]
-        keywords_dict[cluster_id] = ", ".join(top_terms)
-        
+    vectorizer, X = _fitted_tfidf(df_hash, _df)
+    terms = vectorizer.get_feature_names_out()
+
+    unique_clusters, cluster_idx = np.unique(_df['cluster_id'].to_numpy(),
+                                             return_inverse=True)
+    sizes = np.bincount(cluster_idx).astype(np.float32)
+    membership = scipy.sparse.csr_matrix(
+        (1.0 / sizes[cluster_idx], (cluster_idx, np.arange(len(cluster_idx)))),
+        shape=(len(unique_clusters), len(cluster_idx))
+    )
+    mean_tfidf = np.asarray((membership @ X).todense())
+
+    top_k = min(10, mean_tfidf.shape[1])
+    top_idx = np.argpartition(-mean_tfidf, top_k - 1, axis=1)[:, :top_k]
+    order = np.take_along_axis(-mean_tfidf, top_idx, axis=1).argsort(axis=1)
+    top_idx = np.take_along_axis(top_idx, order, axis=1)
+
+    for row, cluster_id in enumerate(unique_clusters):
+        keywords_dict[cluster_id] = ", ".join(terms[top_idx[row]])
+
     return keywords_dict
 
 
+@st.cache_data
+def _sentiment_histogram(mask_hash: str, _values: np.ndarray):
+    """
+    Pre-bins the sentiment scores so Plotly receives 50 bars instead of the
+    whole column. px.histogram ships every row to the browser and re-bins
+    in JS; binning here keeps the payload O(bins) regardless of row count.
+    Keyed on a hash of the filter mask so switching tabs reuses the bins.
+    """
+    counts, edges = np.histogram(_values, bins=50, range=(-1.0, 1.0))
+    centers = (edges[:-1] + edges[1:]) / 2
+    return centers, counts
+
+
+@st.cache_data
+def _sidebar_meta(df_hash: str, _df: pd.DataFrame):
+    """
+    Precomputes the values the sidebar widgets need (unique subreddits and
+    clusters, score and date bounds). Each of these is a full column scan,
+    and Streamlit reruns the whole script on every widget interaction —
+    caching them turns four O(N) scans per rerun into a dict lookup.
+    """
+    return {
+        'subreddits': sorted(_df['subreddit'].unique().tolist()),
+        'clusters': sorted(_df['cluster_id'].unique().tolist()),
+        'min_score': int(_df['score'].min()),
+        'max_score': int(_df['score'].max()),
+        'min_date': _df['created_utc'].min().date(),
+        'max_date': _df['created_utc'].max().date(),
+    }
+
+
+def _refresh_cache_duckdb(db_path, parquet_path, query):
+    """
+    Rebuilds the Parquet mirror with DuckDB's sqlite scanner when duckdb is
+    installed: one vectorized COPY moves the table columnar-to-columnar,
+    skipping the per-row Python conversion of the sqlite3 + pandas path.
+    Returns True on success, False to fall back.
+    """
+    try:
+        import duckdb
+        con = duckdb.connect()
+        con.execute("INSTALL sqlite; LOAD sqlite;")
+        con.execute(f"ATTACH '{db_path}' AS r (TYPE sqlite)")
+        con.execute(
+            f"COPY ({query.format(table='r.posts')}) "
+            f"TO '{parquet_path}' (FORMAT parquet, COMPRESSION zstd)"
+        )
+        con.close()
+        return True
+    except Exception:
+        return False
+
+
 @st.cache_data
 def load_data():
-    """Connects to the SQLite database and loads the posts table into a pandas DataFrame."""
+    """
+    Loads the ready posts into a pandas DataFrame. The SQL result is
+    mirrored to a Parquet file next to the database and cold starts read
+    that columnar copy (memory-mapped, Arrow-backed) instead of re-parsing
+    SQLite rows; the mirror refreshes whenever the DB file is newer.
+    """
     db_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'reddit_data.db')
+    parquet_path = os.path.join(os.path.dirname(db_path), 'posts_cache.parquet')
     try:
-        conn = sqlite3.connect(db_path)
-        # Load only posts that have been summarized AND clustered
-        query = "SELECT * FROM posts WHERE summary IS NOT NULL AND cluster_id IS NOT NULL AND summary != 'NoSummaryGenerated'"
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        # Load only posts that have been summarized AND clustered.
+        # Project just the columns the UI renders — pulling `body` (usually
+        # the widest column) would bloat both the read and the cached frame.
+        query = '''
+            SELECT id, title, url, subreddit, cluster_id, score, created_utc,
+                   summary, sentiment
+            FROM {table}
+            WHERE summary IS NOT NULL AND cluster_id IS NOT NULL
+              AND summary != 'NoSummaryGenerated'
+        '''
+        stale = (not os.path.exists(parquet_path)
+                 or os.path.getmtime(db_path) > os.path.getmtime(parquet_path))
+        if stale and not _refresh_cache_duckdb(db_path, parquet_path, query):
+            # Fallback: row-by-row extraction through sqlite3 + pandas.
+            conn = sqlite3.connect(db_path)
+            pd.read_sql_query(query.format(table='posts'), conn).to_parquet(
+                parquet_path, compression='zstd')
+            conn.close()
+
+        df = pd.read_parquet(parquet_path, engine='pyarrow',
+                             dtype_backend='pyarrow', memory_map=True)
         df['created_utc'] = pd.to_datetime(df['created_utc'], unit='s')
+        # Narrow numeric dtypes; Reddit scores and cluster ids fit easily.
+        df = df.astype({'score': 'int32', 'cluster_id': 'int16',
+                        'sentiment': 'float32'}, errors='ignore')
         return df
     except Exception as e:
         st.error(f"Failed to load data from database: {e}")
@@ -77,60 +187,69 @@ def main():
     # --- Sidebar for Filters ---
     st.sidebar.header("Filters")
 
+    # Widget bounds come from the cached metadata, not fresh column scans.
+    df_hash = dataset_hash(df_posts)
+    meta = _sidebar_meta(df_hash, df_posts)
+
     # Subreddit Filter
-    subreddit_list = sorted(df_posts['subreddit'].unique().tolist())
+    subreddit_list = meta['subreddits']
     selected_subreddits = st.sidebar.multiselect("Select Subreddits", subreddit_list, default=subreddit_list)
 
-    # Cluster Multi-Select Filter 
-    cluster_list = sorted(df_posts['cluster_id'].unique().tolist()) 
+    # Cluster Multi-Select Filter
+    cluster_list = meta['clusters']
     selected_clusters = st.sidebar.multiselect("Select Topic Clusters", cluster_list, default=cluster_list)
-        
-        # Date Range Filter 
-    min_date = df_posts['created_utc'].min().date() 
-    max_date = df_posts['created_utc'].max().date() 
-    selected_date_range = st.sidebar.date_input( 
-        "Select Date Range", 
-        value=(min_date, max_date), 
-        min_value=min_date, 
-        max_value=max_date 
-    ) 
-
-    # Score Range Filter 
-    min_score = int(df_posts['score'].min()) 
-    max_score = int(df_posts['score'].max()) 
-    selected_score_range = st.sidebar.slider( 
-        "Select Score Range", 
-        min_value=min_score, 
-        max_value=max_score, 
-        value=(min_score, max_score) 
-    ) 
+
+        # Date Range Filter
+    min_date = meta['min_date']
+    max_date = meta['max_date']
+    selected_date_range = st.sidebar.date_input(
+        "Select Date Range",
+        value=(min_date, max_date),
+        min_value=min_date,
+        max_value=max_date
+    )
+
+    # Score Range Filter
+    min_score = meta['min_score']
+    max_score = meta['max_score']
+    selected_score_range = st.sidebar.slider(
+        "Select Score Range",
+        min_value=min_score,
+        max_value=max_score,
+        value=(min_score, max_score)
+    )
 
     search_term = st.sidebar.text_input("Search in Summaries")
     # --- Filter the DataFrame based on selections ---
 
-    filtered_df = df_posts
+    # Combine every predicate into ONE boolean mask over NumPy arrays and
+    # index once at the end. Chaining filtered_df[...] per filter copies
+    # the whole frame for each step.
+    mask = np.ones(len(df_posts), dtype=bool)
 
-    # Apply filters sequentially
     if selected_subreddits:
-        filtered_df = filtered_df[filtered_df['subreddit'].isin(selected_subreddits)]
+        mask &= np.isin(df_posts['subreddit'].to_numpy(), selected_subreddits)
     if selected_clusters:
-        filtered_df = filtered_df[filtered_df['cluster_id'].isin(selected_clusters)]
-
+        mask &= np.isin(df_posts['cluster_id'].to_numpy(), selected_clusters)
 
     # Ensure date range has two values before trying to filter
     if len(selected_date_range) == 2:
-        filtered_df = filtered_df[
-            (filtered_df['created_utc'].dt.date >= selected_date_range[0]) & 
-            (filtered_df['created_utc'].dt.date <= selected_date_range[1])
-        ]
+        dates = df_posts['created_utc'].to_numpy().astype('datetime64[D]')
+        mask &= ((dates >= np.datetime64(selected_date_range[0]))
+                 & (dates <= np.datetime64(selected_date_range[1])))
 
-    filtered_df = filtered_df[
-        (filtered_df['score'] >= selected_score_range[0]) & 
-        (filtered_df['score'] <= selected_score_range[1])
-    ]
+    scores = df_posts['score'].to_numpy()
+    mask &= (scores >= selected_score_range[0]) & (scores <= selected_score_range[1])
 
     if search_term:
-        filtered_df = filtered_df[filtered_df['summary'].str.contains(search_term, case=False, na=False)]
+        # Escape so the user's input is a literal substring match rather
+        # than accidental regex syntax. The pattern must stay a plain
+        # string: the Arrow-backed summary column routes str.contains to
+        # pyarrow's match_substring_regex, which rejects re.Pattern objects.
+        mask &= df_posts['summary'].str.contains(
+            re.escape(search_term), case=False, regex=True, na=False).to_numpy()
+
+    filtered_df = df_posts[mask]
 
     st.header("Key Metrics")
     total_posts = len(filtered_df)
@@ -151,19 +270,33 @@ def main():
         st.info(f"Displaying {len(filtered_df)} posts matching your filters.")
         sorted_df = filtered_df.sort_values(by='score', ascending=False)
 
-        for index, post in sorted_df.iterrows():
-            st.subheader(f"[{post['title']}]({post['url']})")
-            st.caption(f"r/{post['subreddit']} • Cluster: {post['cluster_id']} • Score: {post['score']} • {post['created_utc'].strftime('%Y-%m-%d')}")
+        # Paginate so each rerun renders a bounded number of widgets no
+        # matter how large the dataset grows.
+        PAGE_SIZE = 25
+        max_pages = max(1, -(-len(sorted_df) // PAGE_SIZE))
+        page = st.number_input("Page", min_value=1, max_value=max_pages, value=1)
+        page_df = sorted_df.iloc[(page - 1) * PAGE_SIZE : page * PAGE_SIZE]
+
+        # itertuples yields one namedtuple per row instead of boxing every
+        # cell into a fresh Series the way iterrows does.
+        for post in page_df.itertuples(index=False):
+            st.subheader(f"[{post.title}]({post.url})")
+            st.caption(f"r/{post.subreddit} • Cluster: {post.cluster_id} • Score: {post.score} • {post.created_utc.strftime('%Y-%m-%d')}")
             with st.container(border=True):
                 st.markdown("**🤖 AI-Generated Summary:**")
-                st.write(post['summary'])
+                st.write(post.summary)
             st.divider()
 
     with tab2:
         st.header("Visualizations")
         if not filtered_df.empty:
             st.subheader("Distribution of Sentiment Scores")
-            fig_sentiment = px.histogram(filtered_df, x="sentiment", nbins=50, title="Distribution of Sentiment Scores")
+            mask_hash = df_hash + hashlib.md5(mask.tobytes()).hexdigest()
+            centers, counts = _sentiment_histogram(
+                mask_hash, filtered_df['sentiment'].to_numpy(dtype=np.float64))
+            fig_sentiment = px.bar(x=centers, y=counts,
+                                   labels={'x': 'sentiment', 'y': 'count'},
+                                   title="Distribution of Sentiment Scores")
             st.plotly_chart(fig_sentiment, use_container_width=True)
         else:
             st.warning("No data to visualize for the current filter selection.")
@@ -0,0 +1,35 @@
+#!/usr/bin/env bash
+# dashboard/serve_multi.sh
+#
+# Streamlit is a single Python process, so two simultaneous users queue
+# behind each other on the GIL. This script launches (2 * cores) + 1
+# replicas on sequential ports; put any TCP load balancer (nginx, haproxy,
+# caddy) in front of them with sticky sessions to scale concurrent-user
+# throughput roughly linearly in cores.
+#
+# Per-replica memory stays flat: load_data() reads the Parquet mirror with
+# memory_map=True, so the Arrow buffers live in the OS page cache and are
+# shared read-only across all worker processes.
+#
+# Usage: ./dashboard/serve_multi.sh [num_workers] [base_port]
+
+set -euo pipefail
+
+CORES=$(nproc 2>/dev/null || sysctl -n hw.ncpu 2>/dev/null || echo 1)
+WORKERS=${1:-$((2 * CORES + 1))}
+BASE_PORT=${2:-8501}
+APP_DIR="$(cd "$(dirname "$0")" && pwd)"
+
+PIDS=()
+trap 'kill "${PIDS[@]}" 2>/dev/null' EXIT
+
+for i in $(seq 0 $((WORKERS - 1))); do
+    PORT=$((BASE_PORT + i))
+    streamlit run "$APP_DIR/app.py" \
+        --server.port "$PORT" \
+        --server.headless true &
+    PIDS+=($!)
+    echo "Started dashboard worker $((i + 1))/$WORKERS on port $PORT (pid ${PIDS[-1]})"
+done
+
+wait
@@ -1,24 +1,53 @@
 
 '''from ai.summarize import summarize_text'''
-from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from itertools import islice, repeat
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from ai.summarize import summarize_batch
 import praw
+from praw.models import Comment
 import yaml
+try:
+    # libyaml-backed parser when PyYAML was built with the C extension.
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+import hashlib
+import logging
 import sqlite3
 import os
 import time
 import re
 
+# Per-post chatter goes through logger.debug: when the level is INFO the
+# call short-circuits before formatting (hence %s style, not f-strings),
+# so the hot path skips the stdout lock/encode/flush print() pays.
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=1)
 def load_config():
-    """Loads the configuration from settings.yaml."""
+    """Loads the configuration from settings.yaml (parsed once, then cached)."""
     config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'settings.yaml')
     with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=_YamlLoader)
+
+def tune_connection(conn):
+    """Applies the scraper's SQLite PRAGMAs: WAL with relaxed syncs so batch
+    commits don't fsync the journal per statement, plus in-memory temp
+    storage, a 64 MB page cache, and mmap'd reads. journal_mode=WAL is
+    persistent in the file; the rest are per-connection."""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA mmap_size=268435456")
 
 def init_db(db_path):
     """Initializes the SQLite database."""
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
     conn = sqlite3.connect(db_path)
+    tune_connection(conn)
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS posts (
@@ -33,11 +62,72 @@ def init_db(db_path):
             score INTEGER, created_utc REAL, FOREIGN KEY (post_id) REFERENCES posts (id)
         )
     ''')
+    # Partial index matching the dashboard's load predicate (summarized AND
+    # clustered posts) so its reload is an index scan, not a table walk.
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_posts_ready
+            ON posts(cluster_id)
+            WHERE summary IS NOT NULL AND summary != 'NoSummaryGenerated'
+              AND cluster_id IS NOT NULL
+    ''')
+    # Covering index for the per-subreddit dedup query in main(): the ids of
+    # one subreddit come straight off the index without touching the table.
+    # NOCASE because the query compares the config's subreddit spelling
+    # against Reddit's canonical display_name (drop the old case-sensitive
+    # index on databases that predate the collation change).
+    cursor.execute("DROP INDEX IF EXISTS idx_posts_sub")
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_posts_sub_nocase
+            ON posts(subreddit COLLATE NOCASE, id)
+    ''')
+    # Memoizes AI output by discussion-text hash so re-runs and cross-posts
+    # with identical content never spend a second Gemini call.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS summary_cache (
+            text_hash TEXT PRIMARY KEY, summary TEXT
+        )
+    ''')
+    # Comments are only ever looked up by their parent post.
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_comments_post_id ON comments(post_id)
+    ''')
+    cursor.execute("ANALYZE posts")
     conn.commit()
     conn.close()
     print(f"Database initialized at {db_path}")
 
-# In scraper/scrape.py, replace the old clean_summary function
+# Patterns used by clean_summary, compiled once at import. The module-level
+# handles skip the re-cache lookup that re.sub/re.search with string
+# patterns pays on every call.
+_TAG_RE = re.compile(r'<.*?>|\[.*?\]|<｜.*?｜>', re.DOTALL)
+# One alternation covering every known preamble, so a single pass over the
+# text replaces up to five. Longer phrases come first inside the optional
+# group so the regex prefers the most specific match.
+_PREAMBLE_RE = re.compile(
+    r'(?:Here is the summary(?: you requested| paragraph)?:'
+    r'|Summary:'
+    r'|The following is a summary:)',
+    re.IGNORECASE,
+)
+_LEAD_RE = re.compile(r'^\s*(Comments|Post Title):?\s*', re.IGNORECASE)
+_BULLET_RE = re.compile(r'^\s*[\*\-]\s*|\d+\.\s*', re.MULTILINE)
+_WS_RE = re.compile(r'\s+')
+
+# Insert statements as module constants so every batch reuses the exact
+# same SQL string; sqlite3's per-connection statement cache is keyed on it,
+# making each executemany a cache hit rather than a fresh prepare.
+# OR IGNORE backstops the pre-summarization dedup set: a post that raced
+# in from a concurrent run (or a stale set) is silently skipped instead of
+# aborting the whole batch with an IntegrityError.
+_INSERT_POST_SQL = '''
+    INSERT OR IGNORE INTO posts (id, subreddit, title, body, author, score, created_utc, url, summary)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_INSERT_COMMENT_SQL = (
+    'INSERT OR IGNORE INTO comments (id, post_id, author, body, score, created_utc) '
+    'VALUES (?, ?, ?, ?, ?, ?)'
+)
+
 
 def clean_summary(summary_text: str) -> str:
     """
@@ -46,66 +136,187 @@ def clean_summary(summary_text: str) -> str:
     """
     if not summary_text or summary_text == "NoSummaryGenerated":
         return "NoSummaryGenerated"
-    
 
-    # 1. Remove any "thinking" blocks or XML-style tags
-    text = re.sub(r'<.*?>|\[.*?\]|<｜.*?｜>', '', summary_text, flags=re.DOTALL)
-    
+
+    # 1. Remove any "thinking" blocks or XML-style tags. Most summaries
+    # contain neither bracket, and the memchr-backed `in` check is far
+    # cheaper than spinning up the regex engine to find nothing.
+    if '<' in summary_text or '[' in summary_text:
+        text = _TAG_RE.sub('', summary_text)
+    else:
+        text = summary_text
+
     # 2. Find the core summary by removing common conversational preambles.
-    # This looks for phrases like "Here is the summary:" and takes everything AFTER them.
-    preamble_patterns = [
-        r'Here is the summary you requested:',
-        r'Here is the summary paragraph:',
-        r'Here is the summary:',
-        r'Summary:',
-        r'The following is a summary:'
-    ]
-    for pattern in preamble_patterns:
-        if re.search(pattern, text, re.IGNORECASE):
-            text = re.split(pattern, text, maxsplit=1, flags=re.IGNORECASE)[1]
-            break # Stop after the first match
+    # This looks for phrases like "Here is the summary:" and takes everything
+    # AFTER the first one found, in a single scan of the text.
+    text = _PREAMBLE_RE.split(text, maxsplit=1)[-1]
 
     # 3. Basic cleaning from before
-    text = re.sub(r'^\s*(Comments|Post Title):?\s*', '', text, flags=re.IGNORECASE).strip()
-    text = re.sub(r'^\s*[\*\-]\s*|\d+\.\s*', '', text, flags=re.MULTILINE)
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = _LEAD_RE.sub('', text).strip()
+    text = _BULLET_RE.sub('', text)
+    text = _WS_RE.sub(' ', text).strip()
 
-    # 4. Final quality check
-    if len(text.split()) < 5:
+    # 4. Final quality check. Whitespace was just collapsed to single
+    # spaces, so the word count is space-count + 1; counting bytes beats
+    # allocating a list of every word via split().
+    if not text or text.count(' ') < 4:
         return "NoSummaryGenerated"
         
     return text
 
-def fetch_post_data(post, scraper_config):
-    """Fetches comments for a single post and prepares its data for summarization."""
+def fetch_post_data(post, comment_limit, min_post_score):
+    """Fetches comments for a single post and prepares its data for
+    summarization. Config values arrive as plain arguments, resolved once
+    per subreddit rather than through nested dict lookups per post."""
     try:
-        print(f"  -> Starting comment fetch for post: '{post.title[:50]}...'")
+        # Low-signal posts aren't worth a comment fetch, let alone an AI
+        # call: below the score floor, or no comments and barely any body.
+        # These fields are all present in the listing payload, so the
+        # checks cost nothing over the network.
+        if (post.score < min_post_score
+                or (post.num_comments == 0 and len(post.selftext) < 200)):
+            logger.debug("  -> Skipping low-signal post: '%.50s...'", post.title)
+            return None
+
+        logger.debug("  -> Starting comment fetch for post: '%.50s...'", post.title)
+        # Ask Reddit for a pre-sorted, pre-truncated comment payload: set
+        # before the first .comments access so the fetch itself is smaller
+        # and the best comments are first without any client-side sort.
+        post.comment_sort = "top"
+        post.comment_limit = comment_limit
         post.comments.replace_more(limit=0)  # This is the network call we want to parallelize
-        top_comments = post.comments.list()[:scraper_config.get('comments', {}).get('limit_per_post', 10)]
+        # Filter non-Comment stubs BEFORE slicing, so the limit counts real
+        # comments and the loops below need no per-item type checks.
+        top_comments = list(islice(
+            (c for c in post.comments.list() if isinstance(c, Comment)),
+            comment_limit))
         
-        discussion_text = f"Post Title: {post.title}\nPost Body: {post.selftext}\n\n--- Comments ---\n"
+        # Accumulate pieces and join once: += in a loop can reallocate the
+        # growing string on every comment. Stop as soon as the cap is hit —
+        # comments arrive best-first, so anything past max_chars would be
+        # built only to be sliced away.
+        max_chars = 20000
+        header = f"Post Title: {post.title}\nPost Body: {post.selftext}\n\n--- Comments ---\n"
+        parts = [header]
+        total = len(header)
         for comment in top_comments:
-            if hasattr(comment, 'body'):
-                discussion_text += f"Comment: {comment.body}\n"
+            piece = f"Comment: {comment.body}\n"
+            parts.append(piece)
+            total += len(piece)
+            if total >= max_chars:
+                break
+        discussion_text = "".join(parts)[:max_chars]
 
         if len(discussion_text) < 200:
-            print(f"  -> Skipping post with insufficient discussion text: '{post.title[:50]}...'")
+            logger.debug("  -> Skipping post with insufficient discussion text: '%.50s...'", post.title)
             return None
 
-        max_chars = 20000
-        if len(discussion_text) > max_chars:
-            discussion_text = discussion_text[:max_chars]
-
+        # Bind every PRAW attribute the insert needs right here, while this
+        # thread is already doing I/O for the post. Each access can route
+        # through __getattr__ (and potentially a lazy fetch); the insert
+        # path downstream then only touches plain tuples.
         return {
             "id": post.id,
             "text": discussion_text,
-            "post_obj": post,
-            "top_comments": top_comments
+            "text_hash": hashlib.blake2b(discussion_text.encode(),
+                                         digest_size=16).hexdigest(),
+            "row": (
+                post.id, post.subreddit.display_name, post.title, post.selftext,
+                str(post.author) if post.author else None, post.score,
+                post.created_utc, post.url
+            ),
+            # Comments get the same treatment as the post row: plain tuples,
+            # ready for executemany, with no live PRAW objects kept around.
+            "comment_rows": [
+                (comment.id, post.id, str(comment.author), comment.body,
+                 comment.score, comment.created_utc)
+                for comment in top_comments
+            ],
         }
     except Exception as e:
-        print(f"  -> ERROR fetching comments for post {post.id}: {e}")
+        logger.warning("  -> ERROR fetching comments for post %s: %s", post.id, e)
         return None
 
+def scrape_subreddit(reddit, subreddit_name, scraper_config, limit, existing_ids):
+    """
+    Fetches one subreddit end to end: hot listing, dedup against the ids
+    already stored, then the concurrent comment fan-out. Pure network work —
+    no database access — so whole subreddits can run in parallel. Returns
+    (posts ready for summarization, number of new posts seen).
+    """
+    print(f"\n--- Scraping r/{subreddit_name} ---")
+    posts_to_scrape = list(islice(reddit.subreddit(subreddit_name).hot(limit=limit), limit))
+    new_posts = [post for post in posts_to_scrape if post.id not in existing_ids]
+    if not new_posts:
+        return [], 0
+
+    print(f"Found {len(new_posts)} new posts in r/{subreddit_name}. Fetching comments concurrently...")
+    # Hoist all config lookups out of the per-post path: resolved once
+    # here, passed to fetch_post_data as plain values.
+    comment_limit = scraper_config.get('comments', {}).get('limit_per_post', 10)
+    min_post_score = scraper_config.get('min_post_score', 0)
+    # Comment fetching is pure network wait, so threads release the GIL
+    # for the whole request round-trip; the bound exists only to respect
+    # Reddit rate limits and can be tuned per deployment via config.
+    max_workers = scraper_config.get('comment_workers', 10)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(fetch_post_data, new_posts,
+                               repeat(comment_limit), repeat(min_post_score))
+        # Filter out any 'None' results from posts that were skipped or had errors
+        all_posts_data = [result for result in results if result is not None]
+    return all_posts_data, len(new_posts)
+
+def save_batch(conn, cursor, post_batch, summaries_map):
+    """
+    Saves one summarized batch. Rows are collected into lists first and
+    written with executemany inside a savepoint, so the INSERT statement
+    is compiled once per batch and nothing is made durable until the
+    caller's next conn.commit(). Returns the number of posts stored.
+    """
+    post_rows = []
+    comment_rows = []
+    cache_rows = []
+    for p_data in post_batch:
+        post_id = p_data["id"]
+        raw_summary = summaries_map.get(post_id, "NoSummaryGenerated")
+        summary_text = clean_summary(raw_summary)
+
+        if summary_text != "NoSummaryGenerated":
+            logger.debug("    -> Saving summary for post: %s", post_id)
+            post_rows.append(p_data["row"] + (summary_text,))
+            comment_rows.extend(p_data["comment_rows"])
+            # Cache only summaries that survived cleaning, and cache the
+            # cleaned text: memoizing a raw summary that cleans to nothing
+            # would pin the failure forever, since every later run would
+            # hit the cache instead of retrying the AI.
+            cache_rows.append((p_data["text_hash"], summary_text))
+        else:
+            logger.debug("    -> AI failed to generate summary for post %s. Skipping.", post_id)
+
+    if not post_rows:
+        return 0
+    # Each batch is bracketed by a savepoint nested in an explicit
+    # transaction: a failed batch rolls back alone, and the fsync waits
+    # for the caller's conn.commit(). The BEGIN matters — a SAVEPOINT
+    # opened with no enclosing transaction becomes the outermost one, and
+    # SQLite durably commits when it is released, which would put us back
+    # at one fsync per batch. The scraper is restartable (id dedup), so
+    # losing uncommitted batches on a crash only costs a re-scrape.
+    if not conn.in_transaction:
+        cursor.execute("BEGIN")
+    cursor.execute("SAVEPOINT batch")
+    try:
+        cursor.executemany(_INSERT_POST_SQL, post_rows)
+        cursor.executemany(_INSERT_COMMENT_SQL, comment_rows)
+        cursor.executemany(
+            "INSERT OR IGNORE INTO summary_cache (text_hash, summary) VALUES (?, ?)",
+            cache_rows)
+        cursor.execute("RELEASE batch")
+    except Exception:
+        cursor.execute("ROLLBACK TO batch")
+        raise
+    return len(post_rows)
+
 def main():
     """Initializes Reddit, scrapes posts, summarizes them one-by-one, and stores them."""
     start_time = time.time()
@@ -125,6 +336,9 @@ def main():
             client_secret=config['reddit']['client_secret'],
             user_agent=config['reddit']['user_agent'],
         )
+        # Sleep through a rate-limit window in one go instead of PRAW
+        # raising after its default short back-off and forcing a rerun.
+        reddit.config.ratelimit_seconds = 600
         print("Successfully connected to Reddit API.")
     except Exception as e:
         print(f"Failed to connect to Reddit: {e}")
@@ -136,112 +350,145 @@ def main():
     batch_size = scraper_config.get('batch_size', 5)
     
     conn = sqlite3.connect(db_path)
+    tune_connection(conn)
     cursor = conn.cursor()
 
     subreddits_to_scrape = config.get('subreddits', [])
     print(f"Starting to scrape subreddits: {subreddits_to_scrape}")
 
-    for subreddit_name in subreddits_to_scrape:
-        print(f"\n--- Scraping r/{subreddit_name} ---")
-        subreddit = reddit.subreddit(subreddit_name)
-        api_calls["reddit"] += 1
-        # Stage 1: Get post listings and filter out what we already have
-        posts_to_scrape = subreddit.hot(limit=limit)
-        cursor.execute("SELECT id FROM posts")
-        existing_post_ids = {row[0] for row in cursor.fetchall()}
-        new_posts = [post for post in posts_to_scrape if post.id not in existing_post_ids]
-        
-        if not new_posts:
+    # Subreddits are independent I/O work, so each one (listing fetch,
+    # dedup filter, comment fan-out) runs as its own task on a thread
+    # pool; wall-clock tracks the slowest subreddit instead of the sum.
+    # Dedup sets are read from SQLite here first — workers never touch the
+    # connection, and all writes stay on the main thread.
+    subreddit_pool = ThreadPoolExecutor(max_workers=min(len(subreddits_to_scrape) or 1, 8))
+    scrape_futures = {}
+    for name in subreddits_to_scrape:
+        # Only this subreddit's ids can collide with its hot listing, so
+        # scoping the dedup set keeps its memory bounded per subreddit.
+        # NOCASE: the config may spell the name differently from the
+        # display_name we store (machinelearning vs MachineLearning), and
+        # a case-sensitive match would silently return an empty set.
+        cursor.execute(
+            "SELECT id FROM posts WHERE subreddit = ? COLLATE NOCASE", (name,))
+        existing_ids = frozenset(row[0] for row in cursor.fetchall())
+        scrape_futures[subreddit_pool.submit(
+            scrape_subreddit, reddit, name, scraper_config, limit, existing_ids)] = name
+
+    # Summarization runs on its own small pool so the Gemini round-trip for
+    # one batch overlaps the comment fetches for the next instead of
+    # blocking the scrape loop. Finished batches are drained in submission
+    # order and written by the main thread (the sole owner of `conn`).
+    summarize_pool = ThreadPoolExecutor(max_workers=2)
+    pending_batches = deque()  # (future, post_batch, subreddit_name)
+    saved_per_subreddit = {}
+    # Commit every K stored batches: amortizes the fsync across batches
+    # while keeping the WAL from growing for a whole long run.
+    commit_every = scraper_config.get('commit_every', 5)
+    batches_since_commit = 0
+
+    def drain_pending(block):
+        """Stores every completed summarization batch; with block=True waits
+        for all of them. Returns how many posts were saved."""
+        nonlocal batches_since_commit
+        saved_total = 0
+        while pending_batches:
+            future, batch, name = pending_batches[0]
+            if not block and not future.done():
+                break
+            pending_batches.popleft()
+            summaries_map = future.result()
+            if summaries_map:
+                saved = save_batch(conn, cursor, batch, summaries_map)
+                saved_per_subreddit[name] = saved_per_subreddit.get(name, 0) + saved
+                saved_total += saved
+                batches_since_commit += 1
+                if batches_since_commit >= commit_every:
+                    conn.commit()
+                    batches_since_commit = 0
+        return saved_total
+
+    for future in as_completed(scrape_futures):
+        subreddit_name = scrape_futures[future]
+        try:
+            all_posts_data, new_post_count = future.result()
+        except Exception as e:
+            print(f"Failed to scrape r/{subreddit_name}: {e}")
+            continue
+        api_calls["reddit"] += 1 + new_post_count
+
+        if not all_posts_data:
             print(f"No new posts found in r/{subreddit_name}. Moving on.")
             continue
-            
-        print(f"Found {len(new_posts)} new posts to process. Fetching comments concurrently...")
-        api_calls["reddit"] += len(new_posts)
-        # Stage 2: Fetch comments for ALL new posts concurrently
-        # 3. Use a ThreadPoolExecutor to fetch comments for all new posts at once in parallel not waiting individually
-        all_posts_data = []
-        # Using max_workers=10 to avoid hitting rate limits too aggressively. Adjust as needed.
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            # The map function runs fetch_post_data for each post in the new_posts list
-            results = executor.map(fetch_post_data, new_posts, [scraper_config]*len(new_posts))
-            # Filter out any 'None' results from posts that were skipped or had errors
-            all_posts_data = [result for result in results if result is not None]
-
-        print(f"\nFinished fetching comments. {len(all_posts_data)} posts are ready for summarization.")
-        
-        # 4. Now, process the pre-fetched data in batches for summarization
+
+        print(f"\n--- r/{subreddit_name}: {len(all_posts_data)} posts ready for summarization. ---")
+
+        # Now, queue the pre-fetched data in batches for summarization
         post_batch = []
-        posts_processed_this_subreddit = 0
-        # Stage 3: Loop through the PRE-FETCHED data to batch and summarize
-        # This loop is very fast because there are no network calls inside it.
+        cache_hits = []
+        cached_summaries = {}
+        # Stage 3: Loop through the PRE-FETCHED data to batch and submit.
+        # Batches go to the summarizer pool instead of blocking here, so
+        # Gemini chews on earlier batches while later comments download.
         for post_data in all_posts_data:
+            # Identical discussion text (re-runs, cross-posts) reuses the
+            # memoized AI output instead of burning another Gemini call.
+            cached = cursor.execute(
+                "SELECT summary FROM summary_cache WHERE text_hash = ?",
+                (post_data["text_hash"],)).fetchone()
+            if cached is not None:
+                cache_hits.append(post_data)
+                cached_summaries[post_data["id"]] = cached[0]
+                continue
             post_batch.append(post_data)
-            print(f"  -> Added to batch. Batch size is now {len(post_batch)}/{batch_size}.")
+            logger.debug("  -> Added to batch. Batch size is now %d/%d.", len(post_batch), batch_size)
 
             if len(post_batch) >= batch_size:
-                print(f"\n--- Batch full. Processing {len(post_batch)} posts with AI... ---")
+                print(f"\n--- Batch full. Submitting {len(post_batch)} posts to AI... ---")
                 api_calls["ai_summarizer"] += 1
-                summaries_map = summarize_batch([{"id": p["id"], "text": p["text"]} for p in post_batch])
-
-                if summaries_map:
-                    for p_data in post_batch:
-                        post_obj = p_data["post_obj"]
-                        raw_summary = summaries_map.get(post_obj.id, "NoSummaryGenerated")
-                        summary_text = clean_summary(raw_summary)
-
-                        if summary_text != "NoSummaryGenerated":
-                            print(f"    -> Saving summary for post: {post_obj.id}")
-                            cursor.execute('''
-                                INSERT INTO posts (id, subreddit, title, body, author, score, created_utc, url, summary)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            ''', (
-                                post_obj.id, post_obj.subreddit.display_name, post_obj.title, post_obj.selftext,
-                                str(post_obj.author), post_obj.score, post_obj.created_utc, post_obj.url, summary_text
-                            ))
-                            for comment in p_data["top_comments"]:
-                                if hasattr(comment, 'id'):
-                                    cursor.execute('INSERT OR IGNORE INTO comments (id, post_id, author, body, score, created_utc) VALUES (?, ?, ?, ?, ?, ?)',
-                                                   (comment.id, post_obj.id, str(comment.author), comment.body, comment.score, comment.created_utc))
-                            posts_processed_this_subreddit += 1
-                            total_new_posts += 1
-                        else:
-                            print(f"    -> AI failed to generate summary for post {post_obj.id}. Skipping.")
-                
+                pending_batches.append((
+                    summarize_pool.submit(
+                        summarize_batch,
+                        [{"id": p["id"], "text": p["text"]} for p in post_batch]),
+                    post_batch, subreddit_name
+                ))
                 post_batch = []
-                conn.commit() # Commit after each successful batch
-                print("--- Batch processing complete. ---\n")
+                total_new_posts += drain_pending(block=False)
 
-        # Process any remaining posts that didn't fill a full batch
+        # Queue any remaining posts that didn't fill a full batch
         if post_batch:
-            print(f"\n--- Processing final batch of {len(post_batch)} posts... ---")
+            print(f"\n--- Submitting final batch of {len(post_batch)} posts... ---")
             api_calls["ai_summarizer"] += 1
-            summaries_map = summarize_batch([{"id": p["id"], "text": p["text"]} for p in post_batch])
-            if summaries_map:
-                for p_data in post_batch:
-                    post_obj = p_data["post_obj"]
-                    raw_summary = summaries_map.get(post_obj.id, "NoSummaryGenerated")
-                    summary_text = clean_summary(raw_summary)
-                    if summary_text != "NoSummaryGenerated":
-                        print(f"    -> Saving summary for post: {post_obj.id}")
-                        cursor.execute('''
-                            INSERT INTO posts (id, subreddit, title, body, author, score, created_utc, url, summary)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', (
-                            post_obj.id, post_obj.subreddit.display_name, post_obj.title, post_obj.selftext,
-                            str(post_obj.author), post_obj.score, post_obj.created_utc, post_obj.url, summary_text
-                        ))
-                        for comment in p_data["top_comments"]:
-                            if hasattr(comment, 'id'):
-                                cursor.execute('INSERT OR IGNORE INTO comments (id, post_id, author, body, score, created_utc) VALUES (?, ?, ?, ?, ?, ?)',
-                                               (comment.id, post_obj.id, str(comment.author), comment.body, comment.score, comment.created_utc))
-                        posts_processed_this_subreddit += 1
-                        total_new_posts += 1
-        
-        conn.commit()
-        print(f"Finished r/{subreddit_name}. Stored {posts_processed_this_subreddit} new summarized posts.")
+            pending_batches.append((
+                summarize_pool.submit(
+                    summarize_batch,
+                    [{"id": p["id"], "text": p["text"]} for p in post_batch]),
+                post_batch, subreddit_name
+            ))
+
+        # Cache hits skip the AI entirely and store straight away.
+        if cache_hits:
+            print(f"--- {len(cache_hits)} posts served from the summary cache. ---")
+            saved = save_batch(conn, cursor, cache_hits, cached_summaries)
+            saved_per_subreddit[subreddit_name] = (
+                saved_per_subreddit.get(subreddit_name, 0) + saved)
+            total_new_posts += saved
+
+        print(f"Finished queueing r/{subreddit_name}.")
         ### MODIFICATION END
-        
-    conn.close()
+
+    # Everything is queued; wait out the summarizer and store the rest.
+    # The finally block commits whatever landed even if a batch's future
+    # raises, so a partial run keeps its released savepoints.
+    try:
+        total_new_posts += drain_pending(block=True)
+    finally:
+        conn.commit()
+        summarize_pool.shutdown()
+        subreddit_pool.shutdown()
+        conn.close()
+    for name, saved in saved_per_subreddit.items():
+        print(f"Stored {saved} new summarized posts from r/{name}.")
     end_time = time.time()
     print("\n--- SCRAPING & ANALYSIS COMPLETE ---")
     print(f"      Total Time Elapsed: {end_time - start_time:.2f} seconds")
@@ -287,4 +534,7 @@ else:
 
 
 if __name__ == "__main__":
+    # INFO keeps batch/subreddit milestones visible while the per-post
+    # debug messages cost only a level check.
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     main()
\ No newline at end of file